@@ -13,7 +13,19 @@ import signal
 import errno
 import time
 import json
-from queue import Queue
+import atexit
+import tempfile
+import re
+import zlib
+import bisect
+from array import array
+from collections import deque
+from queue import Queue, Empty
+from concurrent.futures import ThreadPoolExecutor
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
 from datetime import datetime
 from kivy.base import runTouchApp
 from kivy.event import EventDispatcher
@@ -39,36 +51,206 @@ def run_in_thread(fn):
     return run
 
 class TerminalConfig:
-    """Handles terminal configuration and persistence."""
+    """Handles terminal configuration and persistence.
+
+    Mutations are batched and written after FLUSH_DELAY seconds without
+    further changes, and again at exit. Other instances' writes are picked up
+    by comparing the file's mtime.
+    """
     CONFIG_FILE = os.path.expanduser('~/.kivy_console_config')
+    FLUSH_DELAY = 1.0
+    _DELETED = object()
     
     def __init__(self):
         self.settings = {
             'history_size': 1000,
             'scrollback_lines': 10000,
+            'scrollback_compress': True,
             'theme': 'dark',
             'font_size': 32,
             'aliases': {},
-            'env_vars': {}
+            'env_vars': {},
+            'highlight_rules': {
+                'error': r'\b(?:[Ee]rror|ERROR|[Ff]ailed|FAILED|[Ff]atal|FATAL|[Ee]xception|Traceback)\b',
+                'warning': r'\b(?:[Ww]arn(?:ing)?|WARN(?:ING)?)\b',
+                'ip': r'\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b',
+                'path': r'(?<![\w/])(?:~|\.{1,2})?/[\w.\-/]+'
+            }
         }
+        self._lock = threading.RLock()
+        self._pending = []
+        self._timer = None
+        self._deadline = 0
+        self._dirty = False
+        self._mtime = None
+        self._alias_table = None
         self.load_config()
+        atexit.register(self.flush)
     
     def load_config(self):
-        """Load configuration from file."""
+        """Load configuration from file.
+
+        Mutates the live settings, so call it from the UI thread only.
+        """
         try:
             if os.path.exists(self.CONFIG_FILE):
                 with open(self.CONFIG_FILE, 'r') as f:
-                    self.settings.update(json.load(f))
+                    mtime = os.fstat(f.fileno()).st_mtime_ns
+                    data = json.load(f)
+                with self._lock:
+                    self._merge_into(self.settings, data)
+                    self._mtime = mtime
+                    self._alias_table = None
         except Exception as e:
             print(f"Error loading config: {e}")
-    
+
+    def _merge_into(self, settings, data):
+        """Apply file contents to settings, then replay unsaved local changes."""
+        for key, value in data.items():
+            current = settings.get(key)
+            if isinstance(current, dict) and isinstance(value, dict):
+                # Update in place so references such as Shell.aliases stay valid
+                current.clear()
+                current.update(value)
+            else:
+                settings[key] = value
+        for key, name, value in self._pending:
+            self._apply(key, name, value, settings)
+
+    def refresh(self):
+        """Reload if another instance changed the file; returns True on reload.
+
+        Call from the UI thread, like load_config.
+        """
+        with self._lock:
+            try:
+                mtime = os.stat(self.CONFIG_FILE).st_mtime_ns
+            except OSError:
+                return False
+            if mtime == self._mtime:
+                return False
+            self._mtime = mtime  # Don't retry a file that fails to parse on every call
+            self.load_config()
+            return True
+
+    def snapshot(self, key):
+        """Return a copy of a dict setting that is safe to iterate."""
+        with self._lock:
+            return dict(self.settings[key])
+
+    def set(self, key, value):
+        """Set a top-level setting and schedule a save."""
+        self._update(key, None, value)
+
+    def set_item(self, key, name, value):
+        """Set an entry of a dict setting, e.g. an alias, and schedule a save."""
+        self._update(key, name, value)
+
+    def delete_item(self, key, name):
+        """Remove an entry of a dict setting and schedule a save."""
+        self._update(key, name, self._DELETED)
+
+    def _update(self, key, name, value):
+        with self._lock:
+            self._apply(key, name, value)
+            # Pending changes are replayed over external edits on reload
+            self._pending.append((key, name, value))
+            self.save_config()
+
+    def _apply(self, key, name, value, settings=None):
+        if settings is None:
+            settings = self.settings
+        if name is None:
+            settings[key] = value
+        elif value is self._DELETED:
+            settings[key].pop(name, None)
+        else:
+            settings[key][name] = value
+        if key == 'aliases' and settings is self.settings:
+            self._alias_table = None
+
+    @property
+    def alias_table(self):
+        """Aliases with chained aliases pre-expanded, rebuilt only on change."""
+        with self._lock:
+            if self._alias_table is None:
+                aliases = self.settings['aliases']
+                table = {}
+                for name, command in aliases.items():
+                    seen = {name}
+                    first, _, rest = command.partition(' ')
+                    while first in aliases and first not in seen:
+                        seen.add(first)
+                        expansion = aliases[first]
+                        command = f"{expansion} {rest}" if rest else expansion
+                        first, _, rest = command.partition(' ')
+                    table[name] = command
+                self._alias_table = table
+            return self._alias_table
+
     def save_config(self):
-        """Save configuration to file."""
-        try:
-            with open(self.CONFIG_FILE, 'w') as f:
-                json.dump(self.settings, f)
-        except Exception as e:
-            print(f"Error saving config: {e}")
+        """Schedule a save; mutations within FLUSH_DELAY are batched."""
+        with self._lock:
+            self._dirty = True
+            self._deadline = time.monotonic() + self.FLUSH_DELAY
+            if self._timer is None:
+                self._start_timer(self.FLUSH_DELAY)
+
+    def _start_timer(self, delay):
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            remaining = self._deadline - time.monotonic()
+            if remaining > 0:
+                self._start_timer(remaining)
+                return
+            self._timer = None
+        self.flush()
+
+    def flush(self):
+        """Write pending changes atomically via a temp file and os.replace."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return
+            settings = self.settings
+            merged = False
+            try:
+                # Keep other instances' changes without touching the live
+                # settings, which belong to the UI thread
+                if os.stat(self.CONFIG_FILE).st_mtime_ns != self._mtime:
+                    with open(self.CONFIG_FILE, 'r') as f:
+                        data = json.load(f)
+                    settings = {key: dict(value) if isinstance(value, dict) else value
+                                for key, value in self.settings.items()}
+                    self._merge_into(settings, data)
+                    merged = True
+            except (OSError, ValueError):
+                pass
+            directory = os.path.dirname(self.CONFIG_FILE)
+            try:
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.kivy_console_config.')
+                try:
+                    with os.fdopen(fd, 'w') as f:
+                        json.dump(settings, f)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp_path, self.CONFIG_FILE)
+                except BaseException:
+                    os.unlink(tmp_path)
+                    raise
+                # After a merge, leave the mtime unknown so the next refresh()
+                # loads the merged file on the UI thread
+                self._mtime = None if merged else os.stat(self.CONFIG_FILE).st_mtime_ns
+                self._pending = []
+                self._dirty = False
+            except Exception as e:
+                print(f"Error saving config: {e}")
 
 class CommandHistory:
     """Manages command history with persistence."""
@@ -122,6 +304,374 @@ class CommandHistory:
         except Exception as e:
             print(f"Error saving history: {e}")
 
+class HighlightRules:
+    """Compiles highlight rules into a single combined matcher.
+
+    Each rule becomes a named group in one alternation, so a line is scanned
+    once regardless of how many rules are configured. Lines that contain none
+    of the literals every rule requires skip the regex entirely. Attribute ids
+    are stable: a rule name keeps its id across recompiles.
+    """
+    ATTR_PLAIN = 0
+    ATTR_STDERR = 1
+
+    def __init__(self, rules=None):
+        self.attrs = ['plain', 'stderr']
+        self.pattern = None
+        self.literals = None
+        self._groups = {}
+        self.compile(rules or {})
+
+    def attr_id(self, name):
+        """Return the attribute id for a rule name, allocating one if needed."""
+        if name not in self.attrs:
+            self.attrs.append(name)
+        return self.attrs.index(name)
+
+    def compile(self, rules):
+        """Compile ``{name: pattern}`` rules, skipping invalid patterns."""
+        parts = []
+        groups = {}
+        literals = set()
+        for name, pattern in rules.items():
+            try:
+                self.validate(pattern)
+            except re.error as e:
+                print(f"Invalid highlight rule {name}: {e}")
+                continue
+            group = f"h{len(parts)}"
+            parts.append(f"(?P<{group}>{pattern})")
+            groups[group] = self.attr_id(name)
+            required = _required_literals(pattern)
+            if required is None or literals is None:
+                literals = None  # This rule can match anywhere; no prefilter
+            else:
+                literals |= required
+        try:
+            self.pattern = re.compile('|'.join(parts)) if parts else None
+        except re.error as e:
+            print(f"Invalid highlight rules: {e}")
+            self.pattern = None
+        self.literals = tuple(literals) if literals else None
+        self._groups = groups
+
+    @staticmethod
+    def validate(pattern):
+        """Raise re.error unless pattern can be embedded in the combined matcher.
+
+        Global inline flags, named groups and backreferences all break once
+        rules are joined into one alternation.
+        """
+        parsed = sre_parse.parse(pattern)
+        if parsed.state.flags & (re.IGNORECASE | re.MULTILINE | re.DOTALL | re.VERBOSE | re.ASCII):
+            raise re.error("global inline flags are not supported; use (?i:...) instead")
+        if parsed.state.groupdict:
+            raise re.error("named groups are not supported")
+        if any(op in (sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS) for op in _walk_ops(parsed)):
+            raise re.error("backreferences are not supported")
+        re.compile(f"(?P<h0>{pattern})")
+
+    def may_match(self, text):
+        """Cheap prefilter: False when no rule can match anywhere in text."""
+        if self.pattern is None:
+            return False
+        return self.literals is None or any(lit in text for lit in self.literals)
+
+    def runs(self, text):
+        """Return ``(start, length, attr)`` runs for all matches in text."""
+        if not self.may_match(text):
+            return []
+        groups = self._groups
+        return [(m.start(), m.end() - m.start(), groups[m.lastgroup])
+                for m in self.pattern.finditer(text) if m.end() > m.start()]
+
+
+def _walk_ops(items):
+    """Yield every opcode in a parsed pattern, including nested ones."""
+    for op, av in items:
+        yield op
+        for value in (av if isinstance(av, (tuple, list)) else (av,)):
+            if isinstance(value, sre_parse.SubPattern):
+                yield from _walk_ops(value)
+            elif isinstance(value, (tuple, list)):
+                for sub in value:
+                    if isinstance(sub, sre_parse.SubPattern):
+                        yield from _walk_ops(sub)
+
+
+def _required_literals(pattern):
+    """Return literals one of which occurs in every match, or None if unknown.
+
+    Works on the parsed pattern; anything it does not understand, including
+    case-insensitive matching, yields None so the rule is never filtered out.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return None
+    if parsed.state.flags & re.IGNORECASE:
+        return None
+    return _required_in(parsed)
+
+
+def _required_in(items):
+    candidates = []
+    run = ''
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            run += chr(av)
+            continue
+        if run:
+            candidates.append({run})
+            run = ''
+        required = None
+        if op is sre_parse.SUBPATTERN:
+            _, add_flags, _, sub = av
+            if not add_flags & re.IGNORECASE:
+                required = _required_in(sub)
+        elif op is sre_parse.BRANCH:
+            branches = [_required_in(branch) for branch in av[1]]
+            if all(branches):
+                required = set().union(*branches)
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+            required = _required_in(av[2])
+        if required:
+            candidates.append(required)
+    if run:
+        candidates.append({run})
+    if not candidates:
+        return None
+    # Prefer the most selective set: long literals, few alternatives
+    return max(candidates, key=lambda c: (min(map(len, c)), -len(c)))
+
+
+class ScrollbackLine:
+    """A scrollback line: text plus run-length encoded attributes.
+
+    ``attrs`` is an ``array('I')`` of flattened ``start, length, attr``
+    triples, or None for plain lines.
+    """
+    __slots__ = ('text', 'attrs')
+
+    def __init__(self, text, attrs=None):
+        self.text = text
+        self.attrs = attrs
+
+    @property
+    def runs(self):
+        """Attribute runs as ``(start, length, attr)`` tuples."""
+        attrs = self.attrs
+        if not attrs:
+            return []
+        return [tuple(attrs[i:i + 3]) for i in range(0, len(attrs), 3)]
+
+    def nbytes(self):
+        """Bytes held by this line record."""
+        size = sys.getsizeof(self) + sys.getsizeof(self.text)
+        if self.attrs is not None:
+            size += sys.getsizeof(self.attrs)
+        return size
+
+
+class ScrollbackPage:
+    """A fixed-size block of lines, stored either as records or compressed."""
+    __slots__ = ('lines', 'blob', 'count', 'nbytes')
+
+    def __init__(self):
+        self.lines = []
+        self.blob = None
+        self.count = 0
+        self.nbytes = 0
+
+    def freeze(self):
+        """Compress the page's lines into a single zlib blob."""
+        text = '\n'.join(line.text for line in self.lines).encode('utf-8')
+        counts = array('I', (len(line.attrs) if line.attrs else 0 for line in self.lines))
+        attrs = array('I')
+        for line in self.lines:
+            if line.attrs:
+                attrs.extend(line.attrs)
+        self.blob = zlib.compress(struct.pack('>I', len(text)) + text
+                                  + counts.tobytes() + attrs.tobytes(), 1)
+        self.lines = None
+        self.nbytes = sys.getsizeof(self) + sys.getsizeof(self.blob)
+
+    def thaw(self, interned):
+        """Return the page's lines, decompressing if necessary."""
+        if self.lines is not None:
+            return self.lines
+        data = zlib.decompress(self.blob)
+        length, = struct.unpack_from('>I', data)
+        texts = data[4:4 + length].decode('utf-8').split('\n')
+        counts = array('I')
+        counts.frombytes(data[4 + length:4 + length + 4 * self.count])
+        attrs = array('I')
+        attrs.frombytes(data[4 + length + 4 * self.count:])
+        lines = []
+        offset = 0
+        for text, count in zip(texts, counts):
+            if count:
+                lines.append(ScrollbackLine(text, attrs[offset:offset + count]))
+                offset += count
+            else:
+                lines.append(interned.get(text) or ScrollbackLine(text))
+        return lines
+
+
+class ScrollbackBuffer:
+    """Line-oriented scrollback with attribute runs per line.
+
+    Text arrives in arbitrary chunks. The trailing partial line is held open
+    and highlighting only runs once a line is complete, so every line is
+    matched exactly once; chunks in which no rule can match skip it. Lines are kept in pages; pages that fall out of the
+    hot tail are compressed when ``compress`` is set.
+    """
+    PAGE_LINES = 1024
+    HOT_PAGES = 4
+    INTERN_MAX_CHARS = 160
+    INTERN_LIMIT = 4096
+
+    def __init__(self, max_lines=10000, rules=None, compress=True):
+        self.max_lines = max(1, max_lines)
+        self.rules = rules
+        self.compress = compress
+        self.pages = deque([ScrollbackPage()])
+        self.line_count = 0
+        self._interned = {}
+        self._pending = ''
+        self._pending_runs = []
+
+    def __len__(self):
+        return self.line_count + (1 if self._pending else 0)
+
+    def rewrite_pending(self, old, new):
+        """Replace the tail of the open line, e.g. a prompt updated in place."""
+        if old and self._pending.endswith(old):
+            self._pending = self._pending[:-len(old)] + new
+
+    def append(self, text, attr=HighlightRules.ATTR_PLAIN):
+        """Append text, highlighting the lines it completes."""
+        if not text:
+            return
+        if attr:
+            self._pending_runs.append((len(self._pending), len(text), attr))
+        text = self._pending + text
+        end = text.rfind('\n')
+        if end < 0:
+            self._pending = text
+            return
+        self._pending = text[end + 1:]
+        block = text[:end]
+        base_runs = self._pending_runs
+        self._pending_runs = _clip_runs(base_runs, end + 1, len(text))
+        rules = self.rules if self.rules and self.rules.may_match(block) else None
+        if not base_runs and rules is None:
+            for line in block.split('\n'):
+                self._add_line(line, None)
+            return
+        start = 0
+        for line in block.split('\n'):
+            runs = _clip_runs(base_runs, start, start + len(line)) if base_runs else []
+            if rules:
+                runs = _overlay_runs(runs, rules.runs(line))
+            self._add_line(line, array('I', [n for run in runs for n in run]) if runs else None)
+            start += len(line) + 1
+
+    def _add_line(self, text, attrs):
+        """Store one completed line, sharing records for repeated plain lines."""
+        if attrs is None and len(text) <= self.INTERN_MAX_CHARS:
+            record = self._interned.get(text)
+            if record is None:
+                if len(self._interned) >= self.INTERN_LIMIT:
+                    self._interned.clear()
+                record = self._interned[text] = ScrollbackLine(text)
+        else:
+            record = ScrollbackLine(text, attrs)
+        page = self.pages[-1]
+        if page.count >= self.PAGE_LINES:
+            page = ScrollbackPage()
+            self.pages.append(page)
+            if self.compress and len(self.pages) > self.HOT_PAGES:
+                self.pages[-self.HOT_PAGES - 1].freeze()
+        page.lines.append(record)
+        page.count += 1
+        self.line_count += 1
+        while len(self.pages) > 1 and self.line_count - self.pages[0].count >= self.max_lines:
+            self.line_count -= self.pages.popleft().count
+
+    def text_tail(self, count):
+        """Return the last ``count`` complete lines plus the open line as text."""
+        lines = []
+        for page in reversed(self.pages):
+            if len(lines) >= count:
+                break
+            lines[:0] = [line.text for line in page.thaw(self._interned)[-(count - len(lines)):]]
+        lines = lines[-count:] if count else []
+        lines.append(self._pending)
+        return '\n'.join(lines)
+
+    def tail(self, count):
+        """Return the last ``count`` lines as ``(text, runs)`` pairs."""
+        lines = []
+        for page in reversed(self.pages):
+            if len(lines) >= count:
+                break
+            lines[:0] = page.thaw(self._interned)[-(count - len(lines)):]
+        lines = [(line.text, line.runs) for line in lines]
+        if self._pending:
+            lines.append((self._pending, _clip_runs(self._pending_runs, 0, len(self._pending))))
+        return lines[-count:] if count else []
+
+    def memory_usage(self):
+        """Return ``(lines, pages, cold pages, bytes)`` for the stored lines."""
+        size = sys.getsizeof(self.pages)
+        cold = 0
+        seen = set()
+        for page in self.pages:
+            if page.lines is None:
+                cold += 1
+                size += page.nbytes
+                continue
+            size += sys.getsizeof(page) + sys.getsizeof(page.lines)
+            for line in page.lines:
+                if id(line) not in seen:
+                    seen.add(id(line))
+                    size += line.nbytes()
+        size += sys.getsizeof(self._pending)
+        return self.line_count, len(self.pages), cold, size
+
+
+def _overlay_runs(base, overlay):
+    """Merge sorted runs so ``overlay`` wins where it overlaps ``base``."""
+    if not base or not overlay:
+        return base or overlay
+    merged = list(overlay)
+    for start, length, attr in base:
+        pos, end = start, start + length
+        for over_start, over_length, _ in overlay:
+            over_end = over_start + over_length
+            if over_end <= pos or over_start >= end:
+                continue
+            if over_start > pos:
+                merged.append((pos, over_start - pos, attr))
+            pos = max(pos, over_end)
+        if pos < end:
+            merged.append((pos, end - pos, attr))
+    merged.sort()
+    return merged
+
+
+def _clip_runs(runs, start, end):
+    """Clip ``(start, length, attr)`` runs to ``[start, end)``, rebased to start."""
+    clipped = []
+    for run_start, length, attr in runs:
+        begin = max(run_start, start)
+        stop = min(run_start + length, end)
+        if stop > begin:
+            clipped.append((begin - start, stop - begin, attr))
+    return clipped
+
+
 class InteractiveProcess:
     """Handles interactive process execution and communication."""
     def __init__(self, command, cwd=None, env=None):
@@ -223,6 +773,390 @@ class InteractiveProcess:
         except:
             pass
 
+class SessionRecorder:
+    """Records terminal output to a compressed, chunked event log.
+
+    The file starts with a magic line and a JSON metadata block, followed by
+    chunks of ``(start time, length)`` headers and zlib-compressed JSON
+    payloads. Every chunk carries a keyframe of the screen as it was when the
+    chunk started, so a player can seek by decompressing a single chunk.
+    """
+    MAGIC = b'KVREC1\n'
+    CHUNK_HEADER = struct.Struct('>dI')
+    CHUNK_SECONDS = 5.0
+    CHUNK_EVENTS = 4096
+    KEYFRAME_CHARS = 64 * 1024
+    RECORDINGS_DIR = os.path.expanduser('~/.kivy_console_recordings')
+
+    def __init__(self, path=None, cols=80, rows=24):
+        if path is None:
+            name = datetime.now().strftime('session-%Y%m%d-%H%M%S.kvrec')
+            path = os.path.join(self.RECORDINGS_DIR, name)
+        self.path = path
+        self.cols = cols
+        self.rows = rows
+        self.queue = Queue()
+        self.is_recording = False
+        self._file = None
+        self._start = None
+        self._writer = None
+
+    def start(self):
+        """Open the recording file and start the writer thread."""
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._file = open(self.path, 'wb')
+            meta = json.dumps({
+                'version': 1,
+                'width': self.cols,
+                'height': self.rows,
+                'timestamp': int(time.time()),
+            }).encode('utf-8')
+            self._file.write(self.MAGIC + struct.pack('>I', len(meta)) + meta)
+        except Exception as e:
+            print(f"Failed to start recording: {e}")
+            return False
+        self._start = time.monotonic()
+        self.is_recording = True
+        self._writer = self._write_loop()
+        return True
+
+    def record(self, data, code='o'):
+        """Queue an event; the caller never touches the file."""
+        if self.is_recording and data:
+            self.queue.put((time.monotonic() - self._start, code, data))
+
+    def stop(self):
+        """Stop recording and wait for pending events to be written."""
+        if not self.is_recording:
+            return
+        self.is_recording = False
+        self.queue.put(None)
+        self._writer.join()
+
+    @run_in_thread
+    def _write_loop(self):
+        """Drain the event queue into chunks until stopped."""
+        screen = ''
+        events = []
+        while True:
+            try:
+                item = self.queue.get(timeout=self.CHUNK_SECONDS)
+            except Empty:
+                item = False
+            if item:
+                events.append(item)
+            if events and (item is None or item is False
+                           or len(events) >= self.CHUNK_EVENTS
+                           or events[-1][0] - events[0][0] >= self.CHUNK_SECONDS):
+                screen = self._write_chunk(screen, events)
+                events = []
+            if item is None:
+                break
+        try:
+            self._file.close()
+        except Exception as e:
+            print(f"Error closing recording: {e}")
+
+    def _write_chunk(self, screen, events):
+        """Write one chunk and return the screen state after it."""
+        payload = json.dumps({'screen': screen, 'events': events})
+        data = zlib.compress(payload.encode('utf-8'))
+        try:
+            self._file.write(self.CHUNK_HEADER.pack(events[0][0], len(data)) + data)
+            self._file.flush()
+        except Exception as e:
+            print(f"Error writing recording: {e}")
+        output = ''.join(event[2] for event in events if event[1] == 'o')
+        return (screen + output)[-self.KEYFRAME_CHARS:]
+
+
+class SessionPlayer:
+    """Reads a recording and reconstructs the screen at any timestamp."""
+
+    def __init__(self, path):
+        self.path = path
+        self.meta = {}
+        self.index = []
+        self._starts = []
+        self._cache = (None, None)
+        self._load_index()
+
+    def _load_index(self):
+        """Read chunk headers only, skipping over the compressed payloads."""
+        size = os.path.getsize(self.path)
+        header = SessionRecorder.CHUNK_HEADER
+        with open(self.path, 'rb') as f:
+            if f.read(len(SessionRecorder.MAGIC)) != SessionRecorder.MAGIC:
+                raise ValueError(f"{self.path} is not a session recording")
+            length, = struct.unpack('>I', f.read(4))
+            self.meta = json.loads(f.read(length).decode('utf-8'))
+            while True:
+                raw = f.read(header.size)
+                if len(raw) < header.size:
+                    break
+                start, length = header.unpack(raw)
+                offset = f.tell()
+                if offset + length > size:
+                    break  # Truncated final chunk, e.g. after a crash
+                self.index.append((start, offset, length))
+                f.seek(length, os.SEEK_CUR)
+        self._starts = [start for start, _, _ in self.index]
+
+    def read_chunk(self, i):
+        """Return the keyframe screen and events of chunk ``i``."""
+        if self._cache[0] == i:
+            return self._cache[1]
+        _, offset, length = self.index[i]
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            chunk = json.loads(zlib.decompress(f.read(length)).decode('utf-8'))
+        result = (chunk['screen'], chunk['events'])
+        self._cache = (i, result)
+        return result
+
+    @property
+    def duration(self):
+        """Timestamp of the last recorded event."""
+        if not self.index:
+            return 0.0
+        return self.read_chunk(len(self.index) - 1)[1][-1][0]
+
+    def seek(self, timestamp):
+        """Return ``(screen, position)`` for the given timestamp.
+
+        ``position`` is a ``(chunk, event)`` pair to continue playback from.
+        """
+        i = bisect.bisect_right(self._starts, timestamp) - 1
+        if i < 0:
+            return '', (0, 0)
+        screen, events = self.read_chunk(i)
+        j = 0
+        output = []
+        while j < len(events) and events[j][0] <= timestamp:
+            if events[j][1] == 'o':
+                output.append(events[j][2])
+            j += 1
+        screen = (screen + ''.join(output))[-SessionRecorder.KEYFRAME_CHARS:]
+        return screen, (i, j)
+
+    def events(self, position=(0, 0)):
+        """Yield events from ``position`` to the end of the recording."""
+        i, j = position
+        while i < len(self.index):
+            events = self.read_chunk(i)[1]
+            for event in events[j:]:
+                yield event
+            i, j = i + 1, 0
+
+    def export_asciicast(self, out_path):
+        """Write the recording as an asciicast v2 file."""
+        header = {
+            'version': 2,
+            'width': self.meta.get('width', 80),
+            'height': self.meta.get('height', 24),
+            'timestamp': self.meta.get('timestamp', int(time.time())),
+        }
+        with open(out_path, 'w') as f:
+            f.write(json.dumps(header) + '\n')
+            for timestamp, code, data in self.events():
+                f.write(json.dumps([round(timestamp, 6), code, data]) + '\n')
+
+class PromptSegment:
+    """A piece of the prompt.
+
+    Cheap segments render synchronously. Expensive ones are rendered on the
+    prompt worker pool and cached per directory under ``cache_key``.
+    """
+    expensive = False
+
+    def cache_key(self, context):
+        """Cheap fingerprint of the state the segment depends on."""
+        return None
+
+    def render(self, context):
+        return ''
+
+    def cancel(self):
+        """Abort any work in progress; called when the shell exits."""
+
+
+class UserHostSegment(PromptSegment):
+    """``[user@host@dir]``"""
+
+    def render(self, context):
+        return f"[{context['user']}@{context['host']}@{os.path.basename(context['cwd'])}]"
+
+
+class GitSegment(PromptSegment):
+    """Git branch with a ``*`` when the work tree is dirty."""
+    expensive = True
+    TIMEOUT = 2.0
+
+    def __init__(self):
+        self._processes = set()
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+    def _git_dir(self, cwd):
+        """Find the repository's git directory by walking up from cwd."""
+        path = cwd
+        while True:
+            dot_git = os.path.join(path, '.git')
+            if os.path.isdir(dot_git):
+                return dot_git
+            if os.path.isfile(dot_git):  # Worktrees and submodules
+                try:
+                    with open(dot_git) as f:
+                        line = f.read().strip()
+                    if line.startswith('gitdir:'):
+                        return os.path.join(path, line[len('gitdir:'):].strip())
+                except OSError:
+                    pass
+                return None
+            parent = os.path.dirname(path)
+            if parent == path:
+                return None
+            path = parent
+
+    def cache_key(self, context):
+        git_dir = self._git_dir(context['cwd'])
+        if git_dir is None:
+            return None
+        key = [git_dir]
+        for name in ('HEAD', 'index'):
+            try:
+                key.append(os.stat(os.path.join(git_dir, name)).st_mtime_ns)
+            except OSError:
+                key.append(None)
+        return tuple(key)
+
+    def render(self, context):
+        git_dir = self._git_dir(context['cwd'])
+        if git_dir is None:
+            return ''
+        try:
+            with open(os.path.join(git_dir, 'HEAD')) as f:
+                head = f.read().strip()
+        except OSError:
+            return ''
+        branch = head[len('ref: refs/heads/'):] if head.startswith('ref: refs/heads/') else head[:7]
+        return f" ({branch}{self._dirty(context['cwd'])})"
+
+    def _dirty(self, cwd):
+        """Run git status, giving up after TIMEOUT or when cancelled."""
+        try:
+            with self._lock:
+                if self._cancelled:
+                    return ''
+                process = subprocess.Popen(['git', 'status', '--porcelain'], cwd=cwd,
+                                           stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                           text=True)
+                self._processes.add(process)
+        except Exception:
+            return ''  # git may not be installed, e.g. on Android
+        try:
+            stdout, _ = process.communicate(timeout=self.TIMEOUT)
+            return '*' if process.returncode == 0 and stdout.strip() else ''
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            return ''
+        finally:
+            with self._lock:
+                self._processes.discard(process)
+
+    def cancel(self):
+        with self._lock:
+            self._cancelled = True
+            for process in self._processes:
+                process.kill()
+
+
+class StatusSegment(PromptSegment):
+    """Exit code of the last command, when it failed."""
+
+    def render(self, context):
+        status = context.get('status')
+        return f" [{status}]" if status else ''
+
+
+class DurationSegment(PromptSegment):
+    """Duration of the last command, when it was slow."""
+    THRESHOLD = 2.0
+
+    def render(self, context):
+        duration = context.get('duration') or 0
+        return f" {duration:.1f}s" if duration >= self.THRESHOLD else ''
+
+
+class PromptRenderer:
+    """Renders prompt segments, computing expensive ones in the background."""
+    MAX_CACHE = 256
+
+    def __init__(self, segments, max_workers=2):
+        self.segments = segments
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._cache = {}
+        self._inflight = set()
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def render(self, context, on_update=None):
+        """Render now with cached values for expensive segments.
+
+        Stale segments are recomputed on the pool; ``on_update`` is called
+        from a worker thread if a fresh value differs from what was shown.
+        """
+        parts = []
+        for i, segment in enumerate(self.segments):
+            if not segment.expensive:
+                parts.append(segment.render(context))
+                continue
+            key = segment.cache_key(context)
+            with self._lock:
+                cached = self._cache.get((i, context['cwd']))
+            if key is None:
+                parts.append('')
+                continue
+            parts.append(cached[1] if cached else '')
+            if cached is None or cached[0] != key:
+                self._refresh(i, segment, key, context, cached, on_update)
+        return ''.join(parts) + '$ '
+
+    def _refresh(self, i, segment, key, context, cached, on_update):
+        job = (i, context['cwd'], key)
+
+        def compute():
+            try:
+                value = segment.render(context)
+            except Exception as e:
+                print(f"Error rendering prompt segment: {e}")
+                value = ''
+            with self._lock:
+                self._inflight.discard(job)
+                if len(self._cache) >= self.MAX_CACHE:
+                    self._cache.clear()
+                self._cache[(i, context['cwd'])] = (key, value)
+            if on_update and (cached is None or cached[1] != value):
+                on_update()
+
+        with self._lock:
+            # After shutdown the prompt keeps rendering from the cache
+            if self._closed or job in self._inflight:
+                return
+            self._inflight.add(job)
+            self.executor.submit(compute)
+
+    def shutdown(self):
+        """Stop the pool without waiting on slow segments."""
+        with self._lock:
+            self._closed = True
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        for segment in self.segments:
+            segment.cancel()
+
+
 Builder.load_string('''
 <KivyConsole>:
     console_input: console_input
@@ -268,9 +1202,14 @@ class Shell(EventDispatcher):
         'alias': 'manage_aliases',
         'export': 'export_variable',
         'theme': 'change_theme',
+        'highlight': 'manage_highlights',
+        'mem': 'show_memory',
         'python': 'interactive_python',
-        'bash': 'interactive_bash'
+        'bash': 'interactive_bash',
+        'record': 'manage_recording',
+        'replay': 'replay_session'
     }
+    REPLAY_FPS = 30
     
     def __init__(self, **kwargs):
         super(Shell, self).__init__(**kwargs)
@@ -281,16 +1220,27 @@ class Shell(EventDispatcher):
         self.command_history = CommandHistory(self.config.settings['history_size'])
         self.aliases = self.config.settings['aliases']
         self.env_vars = self.config.settings['env_vars']
+        self.highlighter = HighlightRules(self.config.snapshot('highlight_rules'))
+        self.scrollback = ScrollbackBuffer(self.config.settings['scrollback_lines'], self.highlighter,
+                                           self.config.settings['scrollback_compress'])
+        self.term_size = (24, 80)
+        self.last_status = None
+        self.last_duration = None
+        self.prompt_renderer = PromptRenderer([
+            UserHostSegment(), GitSegment(), StatusSegment(), DurationSegment()])
+        self.recorder = None
+        self._replay = None
 
     def parse_command(self, command):
         """Parse and preprocess command, handling aliases and variables."""
-        parts = shlex.split(command)
+        parts = command.split(None, 1)
         if not parts:
             return command
             
         # Handle aliases
-        if parts[0] in self.aliases:
-            command = self.aliases[parts[0]] + ' ' + ' '.join(parts[1:])
+        expansion = self.config.alias_table.get(parts[0])
+        if expansion is not None:
+            command = expansion + ' ' + parts[1] if len(parts) > 1 else expansion
             
         # Expand environment variables
         command = os.path.expandvars(command)
@@ -318,10 +1268,14 @@ class Shell(EventDispatcher):
             """Return the string representation of value, handling None."""
             return str(value) if value is not None else ""
 
+        # Pick up config changes made by other instances
+        if self.config.refresh():
+            self.highlighter.compile(self.config.snapshot('highlight_rules'))
+
         # Check if the command is a built-in or interactive command
         if command in self.BUILTIN_COMMANDS:
             method = getattr(self, self.BUILTIN_COMMANDS[command])
-            return method(command)
+            return self._run_builtin(method, command)
 
         # Interactive commands handling without subprocess
         if command in ['bash', 'python']:
@@ -344,12 +1298,20 @@ class Shell(EventDispatcher):
         # Parse the command
         parsed_command = self.parse_command(command)
         parts = shlex.split(parsed_command)
+        started = time.monotonic()
+        self.last_status = 0
+        self.last_duration = None
 
         # Handle built-in commands (Skip subprocess for these)
         if parts[0] in self.BUILTIN_COMMANDS:
             method = getattr(self, self.BUILTIN_COMMANDS[parts[0]])
-            Clock.schedule_once(lambda dt: method(parts[1:]))
-            Clock.schedule_once(self.dispatch_complete)  # Ensure completion dispatch
+
+            def run_builtin(dt):
+                self._run_builtin(method, parts[1:])
+                # A replay shows its own prompt when it finishes
+                if not self._replay:
+                    self.dispatch_complete()  # Ensure completion dispatch
+            Clock.schedule_once(run_builtin)
             return
 
         # Proceed with normal command handling for external commands
@@ -376,6 +1338,7 @@ class Shell(EventDispatcher):
                         lambda dt, o=output: self.dispatch('on_output', o))
 
             returncode = process.poll()
+            self.last_status = returncode
             if returncode != 0:
                 error = process.stderr.read()
                 error = safe_str(error)  # Ensure error is a valid string
@@ -384,14 +1347,31 @@ class Shell(EventDispatcher):
                         lambda dt: self.dispatch('on_error', f"Error: {error}\n"))
 
         except Exception as e:
+            self.last_status = 1
             # Pass 'e' explicitly to lambda to ensure it has access to the exception object
             Clock.schedule_once(
                 lambda dt, e=e: self.dispatch('on_error', f"Error: {str(e)}\n"))
         finally:
+            self.last_duration = time.monotonic() - started
             Clock.schedule_once(self.dispatch_complete)  # Dispatch completion
 
 
 
+    def _run_builtin(self, method, args):
+        """Run a builtin; it failed if it reported an error via on_error."""
+        errors = []
+
+        def on_error(instance, error):
+            errors.append(error)
+        self.fbind('on_error', on_error)
+        started = time.monotonic()
+        try:
+            return method(args)
+        finally:
+            self.funbind('on_error', on_error)
+            self.last_status = 1 if errors else 0
+            self.last_duration = time.monotonic() - started
+
     # Built-in command implementations
     def change_directory(self, args):
         """Change current directory."""
@@ -410,8 +1390,17 @@ class Shell(EventDispatcher):
         """Exit the shell."""
         if self.interactive_process:
             self.interactive_process.terminate()
+        self.shutdown()
         App.get_running_app().stop()
 
+    def shutdown(self):
+        """Flush state that must survive the session."""
+        if self.recorder:
+            self.recorder.stop()
+            self.recorder = None
+        self.config.flush()
+        self.prompt_renderer.shutdown()
+
     def show_history(self, args):
         """Show command history."""
         for i, cmd in enumerate(self.command_history.history, 1):
@@ -429,6 +1418,10 @@ Available Commands:
   alias        : Manage command aliases
   export       : Set environment variables
   theme        : Change terminal theme
+  highlight    : Manage output highlight rules (name='regex', -d name)
+  mem          : Show scrollback memory usage
+  record       : record start [file] | stop | export <file> <out.cast>
+  replay       : replay <file> [speed] [start seconds]
 
 Special Keys:
   Up/Down      : Navigate command history
@@ -439,30 +1432,63 @@ Special Keys:
 """
         self.dispatch('on_output', help_text)
 
+    def show_memory(self, args):
+        """Show scrollback memory usage."""
+        lines, pages, cold, size = self.scrollback.memory_usage()
+        per_line = size / lines if lines else 0
+        console_input = getattr(self, 'console_input', None)
+        view = len(console_input.text) if console_input else 0
+        self.dispatch('on_output',
+                      f"scrollback: {lines} lines in {pages} pages ({cold} compressed)\n"
+                      f"memory: {size / 1024:.1f} KiB, {per_line:.1f} bytes/line\n"
+                      f"view: {view} chars\n")
+
     def manage_aliases(self, args):
         """Manage command aliases."""
         if not args:
-            for alias, command in self.aliases.items():
+            for alias, command in self.config.snapshot('aliases').items():
                 self.dispatch('on_output', f"alias {alias}='{command}'\n")
         else:
             alias_def = ' '.join(args)
             if '=' in alias_def:
                 name, command = alias_def.split('=', 1)
-                self.aliases[name.strip()] = command.strip("'\"")
-                self.config.save_config()
+                self.config.set_item('aliases', name.strip(), command.strip("'\""))
 
     def export_variable(self, args):
         """Export environment variables."""
         if not args:
-            for key, value in self.env_vars.items():
+            for key, value in self.config.snapshot('env_vars').items():
                 self.dispatch('on_output', f"export {key}={value}\n")
         else:
             var_def = ' '.join(args)
             if '=' in var_def:
                 name, value = var_def.split('=', 1)
-                self.env_vars[name.strip()] = value.strip("'\"")
+                self.config.set_item('env_vars', name.strip(), value.strip("'\""))
                 os.environ[name.strip()] = value.strip("'\"")
-                self.config.save_config()
+
+    def manage_highlights(self, args):
+        """Manage output highlight rules."""
+        if isinstance(args, str) or not args:
+            for name, pattern in self.config.snapshot('highlight_rules').items():
+                self.dispatch('on_output', f"highlight {name}='{pattern}'\n")
+            return
+        if args[0] == '-d':
+            for name in args[1:]:
+                self.config.delete_item('highlight_rules', name)
+        else:
+            rule_def = ' '.join(args)
+            if '=' not in rule_def:
+                self.dispatch('on_error', "usage: highlight name='regex' | -d name\n")
+                return
+            name, pattern = rule_def.split('=', 1)
+            pattern = pattern.strip("'\"")
+            try:
+                HighlightRules.validate(pattern)
+            except re.error as e:
+                self.dispatch('on_error', f"highlight: {str(e)}\n")
+                return
+            self.config.set_item('highlight_rules', name.strip(), pattern)
+        self.highlighter.compile(self.config.snapshot('highlight_rules'))
 
     def change_theme(self, args):
         """Change terminal theme."""
@@ -491,13 +1517,101 @@ Special Keys:
             
         theme_name = args[0]
         if theme_name in themes:
-            self.config.settings['theme'] = theme_name
-            self.config.save_config()
+            self.config.set('theme', theme_name)
             self.dispatch('on_output', f"Theme changed to {theme_name}\n")
             Clock.schedule_once(lambda dt: self._apply_theme(themes[theme_name]))
         else:
             self.dispatch('on_error', f"Unknown theme: {theme_name}\n")
 
+    def manage_recording(self, args):
+        """Start, stop or export session recordings."""
+        if isinstance(args, str) or not args:
+            state = f"recording to {self.recorder.path}" if self.recorder else "not recording"
+            self.dispatch('on_output', f"record: {state}\n")
+            return
+        if args[0] == 'start':
+            if self.recorder:
+                self.dispatch('on_error', f"record: already recording to {self.recorder.path}\n")
+                return
+            rows, cols = self.term_size
+            recorder = SessionRecorder(args[1] if len(args) > 1 else None, cols, rows)
+            if recorder.start():
+                self.recorder = recorder
+                self.dispatch('on_output', f"Recording to {recorder.path}\n")
+            else:
+                self.dispatch('on_error', "record: could not start recording\n")
+        elif args[0] == 'stop':
+            if self.recorder:
+                path = self.recorder.path
+                self.recorder.stop()
+                self.recorder = None
+                self.dispatch('on_output', f"Recording saved to {path}\n")
+        elif args[0] == 'export' and len(args) == 3:
+            try:
+                SessionPlayer(args[1]).export_asciicast(args[2])
+                self.dispatch('on_output', f"Exported {args[1]} to {args[2]}\n")
+            except Exception as e:
+                self.dispatch('on_error', f"record: {str(e)}\n")
+        else:
+            self.dispatch('on_error', "usage: record start [file] | stop | export <file> <out.cast>\n")
+
+    def replay_session(self, args):
+        """Replay a recording at the given speed, optionally from a timestamp."""
+        if isinstance(args, str) or not args:
+            self.dispatch('on_error', "usage: replay <file> [speed] [start seconds]\n")
+            return
+        try:
+            player = SessionPlayer(os.path.expanduser(args[0]))
+            speed = float(args[1]) if len(args) > 1 else 1.0
+            start = float(args[2]) if len(args) > 2 else 0.0
+        except Exception as e:
+            self.dispatch('on_error', f"replay: {str(e)}\n")
+            return
+        self.stop_replay()
+        screen, position = player.seek(start)
+        if screen:
+            self.dispatch('on_output', screen)
+        self._replay = {
+            'events': player.events(position),
+            'pending': None,
+            'clock': start,
+            'speed': speed,
+        }
+        self._replay['tick'] = Clock.schedule_interval(self._replay_tick, 1.0 / self.REPLAY_FPS)
+
+    def _replay_tick(self, dt):
+        """Emit all replay events that are due, batched into one update."""
+        replay = self._replay
+        if replay is None:
+            return False
+        replay['clock'] += dt * replay['speed']
+        output = []
+        event = replay['pending']
+        while True:
+            if event is None:
+                event = next(replay['events'], None)
+                if event is None:
+                    break
+            if replay['speed'] > 0 and event[0] > replay['clock']:
+                break
+            if event[1] == 'o':
+                output.append(event[2])
+            event = None
+        replay['pending'] = event
+        if output:
+            self.dispatch('on_output', ''.join(output))
+        if event is None:
+            self.stop_replay()
+            self.dispatch('on_output', "\n[replay finished]\n")
+            self.dispatch_complete()
+            return False
+
+    def stop_replay(self):
+        """Cancel a running replay."""
+        if self._replay:
+            self._replay['tick'].cancel()
+            self._replay = None
+
     def _apply_theme(self, theme):
         """Apply theme colors to the console."""
         self.parent.background_color = theme['background']
@@ -513,8 +1627,13 @@ from kivy.properties import ObjectProperty
 import subprocess
 
 class ConsoleInput(TextInput):
-    """Enhanced console input with advanced features."""
+    """Enhanced console input with advanced features.
+
+    The shell's ScrollbackBuffer holds the session; the widget only shows
+    the last VIEW_LINES lines of it and is rebuilt from it when it grows.
+    """
     shell = ObjectProperty(None)
+    VIEW_LINES = 1000
 
     def __init__(self, **kwargs):
         kwargs.setdefault('multiline', True)
@@ -525,6 +1644,8 @@ class ConsoleInput(TextInput):
         self._history = []
         self._history_index = 0
         self._cursor_pos = 0
+        self._prompt = None
+        self._view_lines = 0
         self._username = subprocess.run(['whoami'], capture_output=True, text=True).stdout.strip() or 'user'
         self._hostname = subprocess.run(['uname'], capture_output=True, text=True).stdout.strip() or 'localhost'
 
@@ -538,17 +1659,69 @@ class ConsoleInput(TextInput):
             self.focus = True
 
     def prompt(self):
-        """Display the command prompt."""
-        ps1 = f"\n[{self._username}@{self._hostname}@{os.path.basename(self.shell.cur_dir)}]$ "
-        self._append_output(ps1)
-        self._cursor_pos = len(self.text)
+        """Display the command prompt.
+
+        Slow segments show their last known value and are updated in place by
+        _refresh_prompt once recomputed.
+        """
+        context = {
+            'user': self._username,
+            'host': self._hostname,
+            'cwd': self.shell.cur_dir,
+            'status': self.shell.last_status,
+            'duration': self.shell.last_duration,
+        }
+        ps1 = self.shell.prompt_renderer.render(context, self._schedule_prompt_refresh)
+        self._append_output("\n" + ps1)
+        self._prompt = (self._cursor_pos - len(ps1), ps1, context)
 
-    def _append_output(self, text):
+    def _schedule_prompt_refresh(self):
+        """Called from a prompt worker; hop back to the UI thread."""
+        Clock.schedule_once(lambda dt: self._refresh_prompt())
+
+    def _refresh_prompt(self):
+        """Re-render the current prompt if nothing has been printed after it."""
+        if self._prompt is None:
+            return
+        start, old, context = self._prompt
+        if start + len(old) != self._cursor_pos or self.text[start:self._cursor_pos] != old:
+            return
+        new = self.shell.prompt_renderer.render(context, self._schedule_prompt_refresh)
+        if new == old:
+            return
+        typed = self.text[self._cursor_pos:]
+        offset = self.cursor_index() - self._cursor_pos
+        self.text = self.text[:start] + new + typed
+        self.shell.scrollback.rewrite_pending(old, new)
+        self._cursor_pos = start + len(new)
+        self._prompt = (start, new, context)
+        self.cursor = self.get_cursor_from_index(self._cursor_pos + offset)
+
+    def _append_output(self, text, attr=HighlightRules.ATTR_PLAIN):
         """Append output text to the console."""
         text = self._clean_output(text)  # Clean the output from escape codes
+        self.shell.scrollback.append(text, attr)
+        if self.shell.recorder:
+            self.shell.recorder.record(text)
         self.text += text
+        # Everything up to here is output; only text typed after it is input
+        self._cursor_pos = len(self.text)
+        self._view_lines += text.count('\n')
+        if self._view_lines > 2 * self.VIEW_LINES:
+            self._rebuild_view()
         Clock.schedule_once(lambda dt: self._scroll_to_bottom())
 
+    def _rebuild_view(self):
+        """Replace the widget text with the scrollback tail, keeping typed input."""
+        view = self.shell.scrollback.text_tail(self.VIEW_LINES)
+        shift = self._cursor_pos - len(view)
+        self.text = view + self.text[self._cursor_pos:]
+        self._cursor_pos -= shift
+        if self._prompt is not None:
+            start, ps1, context = self._prompt
+            self._prompt = (start - shift, ps1, context)
+        self._view_lines = view.count('\n')
+
     def _scroll_to_bottom(self):
         """Scroll the view to the bottom."""
         if hasattr(self.parent, 'scroll_y'):
@@ -583,6 +1756,9 @@ class ConsoleInput(TextInput):
         # Execute command as usual
         self._history.append(command)
         self._history_index = len(self._history)
+        self.shell.scrollback.append(command)
+        if self.shell.recorder:
+            self.shell.recorder.record(command)
         self._append_output(f"\n")
         if self.shell.interactive_process and self.shell.interactive_process.is_runnping:
             self.shell.interactive_process.write_input(command + '\n')
@@ -608,6 +1784,8 @@ class ConsoleInput(TextInput):
 
     def _handle_interrupt(self):
         """Handle Ctrl+C interrupt."""
+        self.shell.stop_replay()
+        self.shell.scrollback.append(self._get_current_command())
         self._append_output("^C\n")
         self.prompt()
 
@@ -698,6 +1876,7 @@ class KivyConsole(BoxLayout, Shell):
         # Calculate terminal dimensions based on font size and window size
         rows = int(self.height / (self.font_size * 1.5))
         cols = int(self.width / (self.font_size * 0.6))
+        self.term_size = (rows, cols)
         
         # Update terminal size if there's an active process
         if self.interactive_process:
@@ -706,13 +1885,13 @@ class KivyConsole(BoxLayout, Shell):
     def on_output(self, output):
         """Handle output from the shell."""
         if self.console_input:
-            self.console_input.text += output
+            self.console_input._append_output(output)
             self._scroll_to_bottom()
 
     def on_error(self, error):
         """Handle error output from the shell."""
         if self.console_input:
-            self.console_input.text += f"\033[91m{error}\033[0m"  # Red color for errors
+            self.console_input._append_output(error, HighlightRules.ATTR_STDERR)
             self._scroll_to_bottom()
 
     def on_complete(self, *args):
@@ -740,6 +1919,11 @@ class KivyConsoleApp(App):
         
         return console
 
+    def on_stop(self):
+        """Flush recordings and config before the app exits."""
+        if self.root:
+            self.root.shutdown()
+
     def _on_keyboard(self, window, key, *args):
         """Global keyboard handler."""
         if args[-1] == ['ctrl'] and key == 27:  # Ctrl+Esc